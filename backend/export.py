@@ -0,0 +1,243 @@
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from collections import deque
+import argparse
+import requests
+import json
+import csv
+import sys
+import os
+
+# Number of chats fetched in a single pipelined request, and how many of those requests run at once
+BATCH_SIZE = 100
+NUM_WORKERS = 8
+
+# The fields of each chat hash that get fetched (messages holds the state of the graph)
+CHAT_FIELDS = ["id", "title", "createdAt", "messages"]
+
+CSV_COLUMNS = ["chat_id", "title", "created_at", "phase", "day", "section", "exercise"]
+
+class KVClient:
+  """
+  Small client for the Vercel KV REST API that reuses pooled connections and pipelines commands.
+  Anything with the same REST API (like a local serverless-redis-http container) works as a stand-in
+  """
+  def __init__(self, url, token, pool_size=NUM_WORKERS):
+    self.url = url.rstrip("/")
+    self.session = requests.Session()
+    self.session.headers["Authorization"] = f"Bearer {token}"
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    self.session.mount("http://", adapter)
+    self.session.mount("https://", adapter)
+
+  def command(self, command):
+    response = self.session.post(self.url, json=command)
+    response.raise_for_status()
+
+    return response.json()["result"]
+
+  def pipeline(self, commands):
+    response = self.session.post(f"{self.url}/pipeline", json=commands)
+    response.raise_for_status()
+
+    return [item.get("result") for item in response.json()]
+
+def scan_chat_keys(kv, batch_size=BATCH_SIZE):
+  """
+  Scans the KV database for every chat hash one page at a time
+  Args:
+      kv (KVClient): the KV client
+      batch_size (int): roughly how many keys to get back from each scan
+  Yields:
+      List[str]: a page of chat keys (i.e. chat:abc123)
+  """
+  cursor = "0"
+
+  while True:
+    cursor, keys = kv.command(["SCAN", cursor, "MATCH", "chat:*", "COUNT", batch_size])
+    if keys:
+      yield keys
+    if str(cursor) == "0":
+      break
+
+def parse_final_state(messages):
+  """
+  Parses only the state of the last chat message (the same state get_latest_state_from_chat uses)
+  without holding every decoded message in memory at once
+  Args:
+      messages (str): the JSON array of chat messages stored in the KV database
+  Returns:
+      dict: the final state of the chat, or None if the last message doesn't have one
+  """
+  decoder = json.JSONDecoder()
+  last_message = None
+  index = messages.index("[") + 1
+
+  # Decode the array one message at a time, only keeping the latest one
+  while True:
+    while index < len(messages) and messages[index] in " \t\r\n,":
+      index += 1
+    if index >= len(messages) or messages[index] == "]":
+      break
+
+    last_message, index = decoder.raw_decode(messages, index)
+
+  try:
+    return last_message["content"][0]["state"]
+  except (TypeError, KeyError, IndexError):
+    return None
+
+def decode_value(value):
+  """
+  Decodes a hash field that @vercel/kv stored JSON encoded (like the createdAt date)
+  Args:
+      value (str): the raw value of the field
+  Returns:
+      the decoded value, or the raw value if it isn't a JSON string
+  """
+  if isinstance(value, str) and value.startswith('"'):
+    try:
+      return json.loads(value)
+    except ValueError:
+      return value
+
+  return value
+
+def fetch_finished_programs(kv, keys):
+  """
+  Fetches a batch of chats in a single pipelined request and keeps the ones with a finished week of workouts
+  Args:
+      kv (KVClient): the KV client
+      keys (List[str]): the chat keys to fetch
+  Returns:
+      List[dict]: the finished programs in the batch
+  """
+  results = kv.pipeline([["HMGET", key, *CHAT_FIELDS] for key in keys])
+  programs = []
+
+  for key, values in zip(keys, results):
+    # Anything that isn't a chat hash (or was deleted since the scan) comes back without values
+    if not isinstance(values, list):
+      continue
+
+    chat = dict(zip(CHAT_FIELDS, values))
+    if not chat["messages"]:
+      continue
+
+    # One malformed chat shouldn't stop the rest of the export
+    try:
+      state = parse_final_state(chat["messages"])
+      if not isinstance(state, dict) or not state.get("done"):
+        continue
+
+      created_workouts = state.get("created_workouts", [])
+      if not isinstance(created_workouts, list) or not all(isinstance(workout, dict) and all(isinstance(exercises, list) for exercises in workout.values()) for workout in created_workouts):
+        raise ValueError("created_workouts is not a list of workouts")
+
+      programs.append({
+        "chat_id": chat["id"] or key.split(":", 1)[1],
+        "title": chat["title"],
+        "created_at": decode_value(chat["createdAt"]),
+        "phase": state.get("phase"),
+        "workouts_in_week": state.get("workouts_in_week"),
+        "client_info": state.get("client_info"),
+        "created_workouts": created_workouts
+      })
+    except (ValueError, TypeError, AttributeError) as e:
+      print(f"---SKIPPING {key}: {e}---", file=sys.stderr)
+
+  return programs
+
+def write_program(writer, program, output_format):
+  """
+  Writes a single finished program to the export
+  Args:
+      writer: the file (JSONL) or CSV writer to write to
+      program (dict): the finished program
+      output_format (str): jsonl for one program per line, or csv for one exercise per row
+  """
+  if output_format == "jsonl":
+    writer.write(json.dumps(program) + "\n")
+    return
+
+  for day, workout in enumerate(program["created_workouts"]):
+    for section, exercises in workout.items():
+      for exercise in exercises:
+        writer.writerow({
+          "chat_id": program["chat_id"],
+          "title": program["title"],
+          "created_at": program["created_at"],
+          "phase": program["phase"],
+          "day": day + 1,
+          "section": section,
+          "exercise": exercise["exercise"] if isinstance(exercise, dict) else exercise
+        })
+
+def export_programs(kv, output, output_format="jsonl", batch_size=BATCH_SIZE, num_workers=NUM_WORKERS):
+  """
+  Exports every finished program in the KV database, writing each batch as soon as it is fetched.
+  Only a few batches are in flight at once so memory stays bounded no matter how many chats there are
+  Args:
+      kv (KVClient): the KV client
+      output (file): the file to write the export to
+      output_format (str): jsonl or csv
+      batch_size (int): the number of chats fetched per pipelined request
+      num_workers (int): the number of pipelined requests to run at once
+  Returns:
+      int: the number of programs exported
+  """
+  writer = output
+  if output_format == "csv":
+    writer = csv.DictWriter(output, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+
+  exported = 0
+  pending = deque()
+
+  def write_batch(future):
+    nonlocal exported
+    for program in future.result():
+      write_program(writer, program, output_format)
+      exported += 1
+
+  with ThreadPoolExecutor(max_workers=num_workers) as executor:
+    for keys in scan_chat_keys(kv, batch_size):
+      pending.append(executor.submit(fetch_finished_programs, kv, keys))
+
+      # Wait on the oldest batch once enough are in flight
+      if len(pending) >= num_workers * 2:
+        write_batch(pending.popleft())
+
+    while pending:
+      write_batch(pending.popleft())
+
+  return exported
+
+def main():
+  load_dotenv()
+
+  parser = argparse.ArgumentParser(description="Export every finished week of workouts from the Vercel KV database")
+  parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="jsonl for one program per line, or csv for one exercise per row")
+  parser.add_argument("--output", default="-", help="file to write the export to (defaults to stdout)")
+  parser.add_argument("--kv-url", default=os.environ.get("KV_REST_API_URL"), help="KV REST API URL (defaults to KV_REST_API_URL)")
+  parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="chats fetched per pipelined request")
+  parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="pipelined requests to run at once")
+  args = parser.parse_args()
+
+  # The export only reads, so use the read only token when there is one
+  token = os.environ.get("KV_REST_API_READ_ONLY_TOKEN") or os.environ["KV_REST_API_TOKEN"]
+  kv = KVClient(args.kv_url, token, pool_size=args.workers)
+
+  output = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+  try:
+    exported = export_programs(kv, output, args.format, args.batch_size, args.workers)
+  finally:
+    if output is not sys.stdout:
+      output.close()
+
+  print(f"---EXPORTED {exported} PROGRAMS---", file=sys.stderr)
+
+if __name__ == "__main__":
+  main()
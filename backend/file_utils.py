@@ -0,0 +1,17 @@
+import re
+
+# Thread IDs come from the client, so only these characters are allowed when they are used in file names
+SAFE_THREAD_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+def safe_thread_id(thread_id):
+  """
+  Checks that a thread ID can be used in a file name without escaping its directory
+  Args:
+      thread_id (str): the ID of the thread from the graph state
+  Returns:
+      str: the thread ID, or None if it isn't safe to use in a file name
+  """
+  if isinstance(thread_id, str) and SAFE_THREAD_ID.fullmatch(thread_id):
+    return thread_id
+
+  return None
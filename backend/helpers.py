@@ -6,6 +6,7 @@ import requests
 import json
 import os
 
+from recording import record_chain, record_kv_read
 from prompts import day_workout_system_prompt, day_workout_user_prompt, day_workout_reviser_system_prompt, day_workout_reviser_user_prompt, should_revise_workout_system_prompt, should_revise_workout_user_prompt
 
 # Maps the agent to the attributes that define it - the prompts, input variables, and output type (string or JSON)
@@ -13,7 +14,7 @@ chain_name_mapping = {
     "day_workout_generator": {
         "system": day_workout_system_prompt,
         "user": day_workout_user_prompt,
-        "input_variables": ["day", "phase", "workouts_in_week", "workout_length", "extra_criteria", "created_workouts", "client_info"],
+        "input_variables": ["day", "phase", "workouts_in_week", "workout_length", "extra_criteria", "created_workouts", "client_info", "approved_examples"],
         "output_type": "JSON"
     },
     "day_workout_reviser_generator": {
@@ -112,7 +113,8 @@ def get_chain(chain_name):
   parser = StrOutputParser() if chain_data["output_type"] == "STR" else JsonOutputParser()
   chain = prompt | LLM | parser
 
-  return chain
+  # Wrapped so the prompts and responses can be recorded and replayed
+  return record_chain(chain_name, chain)
 
 def get_latest_state_from_chat(chat_id):
   """
@@ -122,6 +124,17 @@ def get_latest_state_from_chat(chat_id):
   Returns:
       dict: the latest state which matches the schema for the LangGraph graph
   """   
+  # The KV read is recorded (or served from the recording when replaying a session)
+  return record_kv_read(chat_id, lambda: fetch_latest_state_from_chat(chat_id))
+
+def fetch_latest_state_from_chat(chat_id):
+  """
+  Reads the chat from the Vercel KV database and parses the state out of the last chat message
+  Args:
+      chat_id (str): the ID of the chat to fetch the latest state from
+  Returns:
+      dict: the latest state which matches the schema for the LangGraph graph
+  """
   try:
     response = requests.get(
         f'{kv_rest_api_url}/hgetall/chat:{chat_id}',
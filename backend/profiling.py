@@ -0,0 +1,133 @@
+from pyinstrument.renderers import SpeedscopeRenderer
+from pyinstrument import Profiler
+from contextvars import ContextVar
+from functools import wraps
+from fastapi import Request
+import itertools
+import time
+import os
+
+from file_utils import safe_thread_id
+
+# Profiling is off unless turned on with the env var, since profiled requests are slower
+profiling_enabled = os.environ.get("PROFILING_ENABLED", "no") == "yes"
+
+# Profile 1 in N requests without the header (0 means only profile requests with the header)
+profile_sample_rate = int(os.environ.get("PROFILE_SAMPLE_RATE") or 0)
+profile_dir = os.environ.get("PROFILE_DIR") or "profiles"
+
+PROFILE_HEADER = "x-profile-request"
+
+# Only the graph routes get profiled (not CORS preflights, the docs, or the playground assets)
+PROFILED_PATH = "/workout"
+
+# Holds the details of the request being profiled (or None) so the graph nodes know to profile themselves
+current_profile = ContextVar("current_profile", default=None)
+request_counter = itertools.count(1)
+
+def should_profile(request):
+  """
+  Determines if a request should be profiled based on the header or the sample rate
+  Args:
+      request (Request): the incoming request
+  Returns:
+      bool: whether or not to profile the request
+  """
+  if not profiling_enabled or request.method == "OPTIONS" or not request.url.path.startswith(PROFILED_PATH):
+    return False
+
+  if request.headers.get(PROFILE_HEADER, "").lower() in ["1", "yes", "true"]:
+    return True
+
+  return profile_sample_rate > 0 and next(request_counter) % profile_sample_rate == 0
+
+def write_profile(profiler, thread_id, name):
+  """
+  Writes a finished profile to the profile directory as a speedscope file (open it at https://www.speedscope.app)
+  Args:
+      profiler (Profiler): the stopped profiler
+      thread_id (str): the ID of the thread that was profiled
+      name (str): the node name (or request) that was profiled
+  Returns:
+      str: the path of the file written
+  """
+  thread_id = safe_thread_id(thread_id) or "unknown"
+
+  os.makedirs(profile_dir, exist_ok=True)
+  path = os.path.join(profile_dir, f"{thread_id}-{name}-{int(time.time() * 1000)}.speedscope.json")
+
+  with open(path, "w") as f:
+    f.write(profiler.output(renderer=SpeedscopeRenderer()))
+
+  print(f"---PROFILE WRITTEN TO {path}---")
+  return path
+
+def profile_node(name, node):
+  """
+  Wraps a graph node so it runs under the sampling profiler when the current request is being profiled
+  Args:
+      name (str): the name of the node in the graph
+      node (function): the node function
+  Returns:
+      function: the wrapped node function
+  """
+  @wraps(node)
+  def wrapper(state):
+    profile = current_profile.get()
+
+    if profile is None:
+      return node(state)
+
+    # Lets the request profile be named after the thread as well
+    profile["thread_id"] = state.get("thread_id") or profile["thread_id"]
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+      return node(state)
+    finally:
+      profiler.stop()
+      write_profile(profiler, profile["thread_id"], name)
+
+  return wrapper
+
+def add_profiling_middleware(app):
+  """
+  Adds the middleware that profiles a request (including the LangServe serialization)
+  when it has the profiling header or gets sampled
+  Args:
+      app (FastAPI): the FastAPI app to add the middleware to
+  """
+  @app.middleware("http")
+  async def profile_request(request: Request, call_next):
+    if not should_profile(request):
+      return await call_next(request)
+
+    # The thread ID is filled in by the first graph node that runs for this request
+    profile = {"thread_id": ""}
+    token = current_profile.set(profile)
+
+    # Samples the whole event loop thread since the response keeps streaming after this middleware returns
+    profiler = Profiler(async_mode="disabled")
+    profiler.start()
+    try:
+      response = await call_next(request)
+
+      # Streaming responses are only done once the body has been sent, so profile through the stream
+      body_iterator = response.body_iterator
+
+      async def profiled_body():
+        try:
+          async for chunk in body_iterator:
+            yield chunk
+        finally:
+          profiler.stop()
+          write_profile(profiler, profile["thread_id"], "request")
+
+      response.body_iterator = profiled_body()
+      return response
+    except Exception:
+      profiler.stop()
+      raise
+    finally:
+      current_profile.reset(token)
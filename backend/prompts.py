@@ -48,6 +48,9 @@ Here are the previous workouts for the week:\n\n {created_workouts} \n\n
 
 Here are the details of the client: \n\n {client_info} \n\n
 
+Here are some workouts (without alternatives) that trainers approved for similar clients in the same phase. Use them as examples of the style, exercise selection,
+and length that trainers are looking for, but still follow all of the instructions above and don't just copy them: \n\n {approved_examples} \n\n
+
 Output the workout in a the JSON format below:
 
 {{
@@ -0,0 +1,175 @@
+from langchain_core.runnables import RunnableLambda
+from contextvars import ContextVar
+from functools import wraps
+import threading
+import json
+import time
+import os
+
+from file_utils import safe_thread_id
+
+# Recording is off unless turned on with the env var since every node, LLM call, and KV read gets written to disk
+recording_enabled = os.environ.get("RECORDING_ENABLED", "no") == "yes"
+recordings_dir = os.environ.get("RECORDINGS_DIR") or "recordings"
+
+# The thread ID of the node currently running so the LLM calls and KV reads get recorded to the right session
+current_thread_id = ContextVar("current_thread_id", default=None)
+
+# The time the current node has spent waiting on the LLM and KV so node timings can leave that I/O out
+current_io_time = ContextVar("current_io_time", default=None)
+
+# The replay currently driving the graph (set by the replay runner) - None when serving real requests
+active_replay = None
+
+recording_lock = threading.Lock()
+
+class ReplayExhausted(Exception):
+  """
+  Raised when the graph asks for an LLM response or KV read that is not in the recording
+  """
+
+def get_recording_path(thread_id):
+  """
+  Gets the path of the recording file for a session
+  Args:
+      thread_id (str): the ID of the thread (session) being recorded
+  Returns:
+      str: the path of the recording file, or None if the thread ID isn't safe to use as a file name
+  """
+  if safe_thread_id(thread_id) is None:
+    return None
+
+  return os.path.join(recordings_dir, f"{thread_id}.jsonl")
+
+def record_entry(entry_type, data):
+  """
+  Appends an entry (node run, LLM call, or KV read) to the recording of the current session
+  Args:
+      entry_type (str): the type of entry (node, llm, or kv)
+      data (dict): the details of the entry
+  """
+  thread_id = current_thread_id.get()
+
+  if not recording_enabled or active_replay is not None or not thread_id:
+    return
+
+  path = get_recording_path(thread_id)
+  if path is None:
+    print(f"---NOT RECORDING UNSAFE THREAD ID {thread_id!r}---")
+    return
+
+  line = json.dumps({"type": entry_type, **data}, default=str)
+
+  with recording_lock:
+    os.makedirs(recordings_dir, exist_ok=True)
+    with open(path, "a") as f:
+      f.write(line + "\n")
+
+def load_recording(path):
+  """
+  Loads all the entries of a recording file
+  Args:
+      path (str): the path of the recording file
+  Returns:
+      List[dict]: the recorded entries in the order they happened
+  """
+  with open(path) as f:
+    return [json.loads(line) for line in f if line.strip()]
+
+def add_io_time(duration):
+  """
+  Adds time spent on an LLM call or KV read to the node that is currently running
+  Args:
+      duration (float): the seconds spent on the call
+  """
+  io_time = current_io_time.get()
+  if io_time is not None:
+    io_time[0] += duration
+
+def record_chain(chain_name, chain):
+  """
+  Wraps a chain so its prompts and responses get recorded, or get served from the recording when replaying
+  Args:
+      chain_name (str): the name of the chain (i.e. agent)
+      chain: the LangChain chain to wrap
+  Returns:
+      Runnable: the wrapped chain which can still be used like any other runnable
+  """
+  def invoke(inputs, config):
+    start = time.perf_counter()
+
+    if active_replay is not None:
+      output = active_replay.next_llm(chain_name, inputs)
+      add_io_time(time.perf_counter() - start)
+      return output
+
+    output = chain.invoke(inputs, config)
+    duration = time.perf_counter() - start
+
+    if recording_enabled:
+      # The prompt is rendered separately from the chain just for the recording
+      prompt = chain.first.invoke(inputs).to_string()
+      record_entry("llm", {"chain": chain_name, "inputs": inputs, "prompt": prompt, "output": output, "duration": duration})
+
+    # Recording overhead is left out of the node's own time too
+    add_io_time(time.perf_counter() - start)
+
+    return output
+
+  return RunnableLambda(invoke, name=chain_name)
+
+def record_kv_read(chat_id, read):
+  """
+  Records a read from the Vercel KV database, or serves it from the recording when replaying
+  Args:
+      chat_id (str): the ID of the chat being read
+      read (function): the function that actually reads from the database
+  Returns:
+      dict: the latest state read for the chat
+  """
+  start = time.perf_counter()
+
+  if active_replay is not None:
+    output = active_replay.next_kv(chat_id)
+    add_io_time(time.perf_counter() - start)
+    return output
+
+  output = read()
+  record_entry("kv", {"chat_id": chat_id, "output": output, "duration": time.perf_counter() - start})
+  add_io_time(time.perf_counter() - start)
+
+  return output
+
+def record_node(name, node):
+  """
+  Wraps a graph node so its input and output get recorded (or compared against the recording when replaying)
+  Args:
+      name (str): the name of the node in the graph
+      node (function): the node function
+  Returns:
+      function: the wrapped node function
+  """
+  @wraps(node)
+  def wrapper(state):
+    token = current_thread_id.set(state.get("thread_id"))
+    io_time = [0.0]
+    io_token = current_io_time.set(io_time)
+    try:
+      start = time.perf_counter()
+      output = node(state)
+      duration = time.perf_counter() - start
+
+      # The node's own time without the LLM and KV calls, since a replay serves those from the file
+      compute_duration = duration - io_time[0]
+
+      if active_replay is not None:
+        active_replay.compare_node(name, output, compute_duration)
+      else:
+        record_entry("node", {"node": name, "input": state, "output": output, "duration": duration, "compute_duration": compute_duration})
+
+      return output
+    finally:
+      current_io_time.reset(io_token)
+      current_thread_id.reset(token)
+
+  return wrapper
@@ -0,0 +1,180 @@
+from collections import defaultdict, deque
+import argparse
+import jsonpatch
+import glob
+import json
+import os
+
+# The replay never touches the network, but the helpers still need these set to be imported
+for env_var in ["USING_NVIDIA", "NVIDIA_API_KEY", "GROQ_API_KEY", "KV_REST_API_URL", "KV_REST_API_TOKEN"]:
+  os.environ.setdefault(env_var, "replay")
+
+import recording
+from recording import ReplayExhausted, load_recording
+from runnable import get_runnable
+
+def to_json(value):
+  """
+  Round trips a value through JSON so it matches what was written to the recording
+  Args:
+      value: the value to convert
+  Returns:
+      the value as it would be loaded back from the recording
+  """
+  return json.loads(json.dumps(value, default=str))
+
+class Replay:
+  """
+  Serves the recorded LLM responses and KV reads for a session and compares
+  every node, LLM call, and KV read the graph makes against what was recorded
+  """
+  def __init__(self, entries):
+    self.queues = defaultdict(deque)
+    self.nodes = deque()
+    self.results = []
+    self.problems = []
+    self.call_diffs = []
+
+    for entry in entries:
+      if entry["type"] == "node":
+        self.nodes.append(entry)
+      else:
+        self.queues[entry["type"]].append(entry)
+
+  def initial_input(self):
+    for entry in self.nodes:
+      if entry["node"] == "entrypoint":
+        return entry["input"]
+
+    raise ValueError("Recording does not start at the entrypoint of the graph")
+
+  def next_entry(self, entry_type, key_field, key):
+    if not self.queues[entry_type]:
+      raise ReplayExhausted(f"No recorded {entry_type} entry left for {key}")
+
+    entry = self.queues[entry_type].popleft()
+
+    # A reordered or new call would otherwise be served the wrong response without any warning
+    if entry[key_field] != key:
+      self.call_diffs.append(f"{entry_type} call for {key} was served the recorded {entry_type} entry for {entry[key_field]}")
+
+    return entry
+
+  def next_llm(self, chain_name, inputs):
+    entry = self.next_entry("llm", "chain", chain_name)
+
+    diff = jsonpatch.make_patch(entry["inputs"], to_json(inputs)).patch
+    if diff:
+      self.call_diffs.append({"llm": chain_name, "inputs": diff})
+
+    return entry["output"]
+
+  def next_kv(self, chat_id):
+    return self.next_entry("kv", "chat_id", chat_id)["output"]
+
+  def compare_node(self, name, output, duration):
+    recorded = self.nodes.popleft() if self.nodes else None
+    call_diffs, self.call_diffs = self.call_diffs, []
+
+    if recorded is None or recorded["node"] != name:
+      self.results.append({"node": name, "duration": duration, "recorded_duration": None, "diff": ["node not in recording"] + call_diffs})
+      return
+
+    diff = jsonpatch.make_patch(recorded["output"], to_json(output)).patch
+    self.results.append({"node": name, "duration": duration, "recorded_duration": recorded.get("compute_duration"), "diff": diff + call_diffs})
+
+  def leftovers(self):
+    """
+    Lists everything in the recording that the replay never used
+    Returns:
+        List[str]: a description of each unused node, LLM call, and KV read
+    """
+    unused = [f"recorded node {entry['node']} never ran" for entry in self.nodes]
+    unused += [f"recorded llm call for {entry['chain']} never made" for entry in self.queues["llm"]]
+    unused += [f"recorded kv read for {entry['chat_id']} never made" for entry in self.queues["kv"]]
+
+    return unused
+
+def replay_session(path):
+  """
+  Drives the graph through a recorded session without any network calls
+  Args:
+      path (str): the path of the recording file
+  Returns:
+      tuple: the timing and diff for every node that ran, and any problems with the session as a whole
+  """
+  replay = Replay(load_recording(path))
+  thread_id = os.path.splitext(os.path.basename(path))[0]
+  config = {"configurable": {"thread_id": thread_id}, "recursion_limit": 25}
+
+  recording.active_replay = replay
+  try:
+    runnable = get_runnable()
+    runnable.invoke(replay.initial_input(), config)
+
+    # Resume after every interrupt just like the frontend does after the trainer gives feedback
+    while runnable.get_state(config).next:
+      runnable.invoke(None, config)
+  except ReplayExhausted as e:
+    # Running out is only expected where the recorded session itself stopped (everything recorded was used)
+    if replay.leftovers():
+      replay.problems.append(f"ran out of recording early: {e}")
+    else:
+      print(f"---RECORDING ENDED: {e}---")
+  finally:
+    recording.active_replay = None
+
+  # Anything left over means the replay skipped calls or ended sooner than the real session,
+  # and any call diffs left are from the node that was running when the replay stopped
+  replay.problems += replay.leftovers() + replay.call_diffs
+
+  return replay.results, replay.problems
+
+def print_report(path, results, problems):
+  """
+  Prints the per node timing and any differences from the recording
+  Args:
+      path (str): the path of the recording file
+      results (List[dict]): the results of replaying the session
+      problems (List): problems with the session as a whole (like unused recorded entries)
+  Returns:
+      bool: whether or not everything matched the recording
+  """
+  print(f"\n{path}")
+  matched = not problems
+
+  # Times are the nodes' own time, without the LLM and KV calls
+  for result in results:
+    recorded_duration = result["recorded_duration"]
+    recorded = f"{recorded_duration * 1000:.2f}ms" if recorded_duration is not None else "n/a"
+    print(f"  {result['node']:<28} {result['duration'] * 1000:>10.2f}ms (recorded {recorded})")
+
+    if result["diff"]:
+      matched = False
+      print(f"    DIFF: {json.dumps(result['diff'], default=str)}")
+
+  for problem in problems:
+    print(f"  MISMATCH: {json.dumps(problem, default=str)}")
+
+  total = sum(result["duration"] for result in results)
+  print(f"  total node time: {total * 1000:.2f}ms")
+
+  return matched
+
+def main():
+  parser = argparse.ArgumentParser(description="Replay recorded sessions against the graph with no network calls")
+  parser.add_argument("paths", nargs="+", help="recording files or directories of recordings")
+  args = parser.parse_args()
+
+  paths = []
+  for path in args.paths:
+    paths += sorted(glob.glob(os.path.join(path, "*.jsonl"))) if os.path.isdir(path) else [path]
+
+  all_matched = True
+  for path in paths:
+    all_matched = print_report(path, *replay_session(path)) and all_matched
+
+  raise SystemExit(0 if all_matched else 1)
+
+if __name__ == "__main__":
+  main()
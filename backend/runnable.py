@@ -5,6 +5,10 @@ from typing import List
 import time
 
 from helpers import get_chain, format_workouts, get_latest_state_from_chat
+from profiling import profile_node
+from recording import record_node
+from workout_duration import fit_workout_length, check_workout_length
+from workout_index import get_approved_examples, add_approved_week
 
 ### State
 class GraphState(TypedDict):
@@ -21,6 +25,7 @@ class GraphState(TypedDict):
     created_workouts: the set of workouts created for the week so far
     client_info: information about the client the workouts are being created for
     user_feedback: the feedback the user gave on the latest workout
+    workout_duration: the estimated length of the current workout and whether it is over or under the goal length
     done : whether or not all workouts have been created or not
     thread_id : the ID of the thread for the current execution of the graph
   """
@@ -33,6 +38,7 @@ class GraphState(TypedDict):
   created_workouts : List[dict]
   client_info : str
   user_feedback : str
+  workout_duration : dict
   done : bool
   thread_id : str
 
@@ -80,10 +86,14 @@ def workout_generator(state):
     "workout_length": workout_length,
     "extra_criteria": extra_criteria,
     "created_workouts": format_workouts(created_workouts),
-    "client_info": client_info
+    "client_info": client_info,
+    "approved_examples": get_approved_examples(client_info, extra_criteria, phase, day)
   })
 
-  return {"day": day, "current_workout": workout, "created_workouts": created_workouts + [workout]}    
+  # Check the length of the workout and trim/add sets or cardio locally instead of needing a revision
+  workout, workout_duration = fit_workout_length(workout, workout_length)
+
+  return {"day": day, "current_workout": workout, "created_workouts": created_workouts + [workout], "workout_duration": workout_duration}    
 
 def post_workout_generator(state):
   """
@@ -143,7 +153,10 @@ def revised_workout_generator(state):
     "user_feedback": user_feedback
   })
 
-  return {"current_workout": revised_workout, "created_workouts": created_workouts[:-1] + [revised_workout]}  
+  # Only flag the length of the revised workout since changing it locally could undo the trainer's feedback
+  workout_duration = check_workout_length(revised_workout, workout_length)
+
+  return {"current_workout": revised_workout, "created_workouts": created_workouts[:-1] + [revised_workout], "workout_duration": workout_duration}  
 
 def post_workout_reviser(state):
   """
@@ -179,6 +192,9 @@ def result_generator(state):
   # Get all the info needed to display the final workout plan for the week
   created_workouts = state["created_workouts"]
 
+  # The trainer approved every workout for the week, so use them as examples for similar clients
+  add_approved_week(state)
+
   return {"created_workouts": created_workouts, "done": True}    
 
 def route_to_revise_workout(state):
@@ -235,16 +251,27 @@ def route_to_results(state):
     print("---ROUTE TO CREATE NEXT WORKOUT---")
     return "nextday"     
 
+def instrument_node(name, node):
+  """
+  Wraps a node so it can be profiled and recorded
+  Args:
+      name (str): the name of the node in the graph
+      node (function): the node function
+  Returns:
+      function: the wrapped node function
+  """
+  return profile_node(name, record_node(name, node))
+
 def get_runnable():
   workflow = StateGraph(GraphState)
 
-  # Define the nodes and how they connect
-  workflow.add_node("entrypoint", entrypoint)
-  workflow.add_node("workout_generator", workout_generator)
-  workflow.add_node("post_workout_generator", post_workout_generator)
-  workflow.add_node("revised_workout_generator", revised_workout_generator)
-  workflow.add_node("post_workout_reviser", post_workout_reviser)
-  workflow.add_node("result_generator", result_generator)
+  # Define the nodes and how they connect (each node is wrapped so it can be profiled and recorded)
+  workflow.add_node("entrypoint", instrument_node("entrypoint", entrypoint))
+  workflow.add_node("workout_generator", instrument_node("workout_generator", workout_generator))
+  workflow.add_node("post_workout_generator", instrument_node("post_workout_generator", post_workout_generator))
+  workflow.add_node("revised_workout_generator", instrument_node("revised_workout_generator", revised_workout_generator))
+  workflow.add_node("post_workout_reviser", instrument_node("post_workout_reviser", post_workout_reviser))
+  workflow.add_node("result_generator", instrument_node("result_generator", result_generator))
 
   workflow.set_entry_point("entrypoint")
 
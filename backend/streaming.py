@@ -0,0 +1,142 @@
+from sse_starlette.sse import EventSourceResponse, ServerSentEvent
+from collections import OrderedDict
+from fastapi import Request
+import jsonpatch
+import json
+
+# The only events the frontend actually consumes - state updates from the graph nodes and LLM tokens
+UI_EVENTS = ["on_chain_end", "on_chat_model_stream", "on_llm_stream"]
+
+# Running totals for each thread (session) of the bytes sent and what sending the full state would have cost.
+# Finished sessions are dropped, and only the most recent sessions are kept so abandoned ones don't pile up
+session_bytes = OrderedDict()
+MAX_TRACKED_SESSIONS = 1000
+
+def serialize_event(event_type, data):
+  """
+  Serializes a single compact event for the delta stream, framed as a server sent event
+  Args:
+      event_type (str): the type of event (delta, token, or end)
+      data (dict): the payload for the event
+  Returns:
+      tuple: the server sent event and the number of bytes it takes on the wire
+  """
+  event = ServerSentEvent(data=json.dumps({"event": event_type, **data}, separators=(",", ":"), default=str))
+  return event, len(event.encode())
+
+def make_state_delta(old_state, new_state):
+  """
+  Creates a JSON patch of the changes between two versions of the graph state so only
+  what changed (like a newly appended workout) gets sent to the frontend
+  Args:
+      old_state (dict): the state last sent to the frontend
+      new_state (dict): the state after a node ran
+  Returns:
+      List[dict]: the JSON patch operations to turn the old state into the new state
+  """
+  return jsonpatch.make_patch(old_state, new_state).patch
+
+async def stream_state_deltas(runnable, input, config):
+  """
+  Streams the events from the LangGraph runnable, only sending the per-node state
+  updates as JSON patches and the LLM token chunks instead of the full state every event
+  Args:
+      runnable: the compiled LangGraph graph
+      input (dict): the input state for the graph (None to resume an interrupted thread)
+      config (dict): the config for the run which includes the thread ID
+  Yields:
+      str: the compact events to send to the frontend
+  """
+  thread_id = config.get("configurable", {}).get("thread_id", "")
+  current_node = None
+  bytes_sent = 0
+  full_state_bytes = 0
+  events_sent = 0
+
+  # Resumed runs start from the checkpointed state so the first patch is a real delta
+  if input is None:
+    state = dict((await runnable.aget_state(config)).values or {})
+  else:
+    state = dict(input)
+
+  async for event in runnable.astream_events(input, config, version="v1"):
+    event_type = event["event"]
+    name = event["name"]
+
+    # Keep track of which node is running so token chunks can be tagged with it
+    if event_type == "on_chain_start" and name in runnable.nodes:
+      current_node = name
+      continue
+
+    if event_type not in UI_EVENTS:
+      continue
+
+    if event_type == "on_chain_end":
+      output = event["data"].get("output")
+
+      # Only the nodes of the graph update the state, skip the inner chains
+      if name not in runnable.nodes or not isinstance(output, dict):
+        continue
+
+      new_state = {**state, **output}
+      delta = make_state_delta(state, new_state)
+      state = new_state
+
+      if not delta:
+        continue
+
+      payload, size = serialize_event("delta", {"node": name, "patch": delta})
+      _, full_size = serialize_event("state", {"node": name, "state": state})
+    else:
+      chunk = event["data"].get("chunk")
+      content = getattr(chunk, "content", chunk)
+
+      if not content:
+        continue
+
+      # Token events are the same size either way
+      payload, size = serialize_event("token", {"node": current_node, "content": content})
+      full_size = size
+
+    bytes_sent += size
+    full_state_bytes += full_size
+    events_sent += 1
+    yield payload
+
+  # The end event would be sent either way
+  payload, size = serialize_event("end", {"bytes_sent": bytes_sent, "events_sent": events_sent})
+  bytes_sent += size
+  full_state_bytes += size
+
+  totals = session_bytes.pop(thread_id, {"bytes_sent": 0, "full_state_bytes": 0, "events_sent": 0})
+  totals["bytes_sent"] += bytes_sent
+  totals["full_state_bytes"] += full_state_bytes
+  totals["events_sent"] += events_sent
+
+  # Keep tracking the session until all the workouts for the week are done
+  if not state.get("done"):
+    session_bytes[thread_id] = totals
+    while len(session_bytes) > MAX_TRACKED_SESSIONS:
+      session_bytes.popitem(last=False)
+
+  yield payload
+
+  print(f"---DELTA STREAM {thread_id}: {bytes_sent} bytes over {events_sent} events this request (full state would be {full_state_bytes} bytes), "
+        f"{totals['bytes_sent']} bytes over {totals['events_sent']} events this session (full state would be {totals['full_state_bytes']} bytes)---")
+
+def add_delta_stream_route(app, runnable, path):
+  """
+  Adds a route next to the LangServe routes that streams the state deltas as server sent events
+  Args:
+      app (FastAPI): the FastAPI app to add the route to
+      runnable: the compiled LangGraph graph
+      path (str): the path of the LangServe routes (i.e. /workout)
+  """
+  @app.post(f"{path}/stream_deltas")
+  async def stream_deltas(request: Request):
+    # Matches the request body LangServe uses for the /stream routes
+    body = await request.json()
+    input = body.get("input")
+    config = body.get("config", {})
+
+    return EventSourceResponse(stream_state_deltas(runnable, input, config))
@@ -0,0 +1,45 @@
+from workout_duration import fit_workout_length, replace_sets, parse_exercise, get_adjustable_exercises
+
+def make_workout(strength, cooldown):
+  return {
+    "1. Warm up": [{"exercise": "Treadmill jog - 10 minutes", "alternatives": []}],
+    "3. Strength portion": [{"exercise": exercise, "alternatives": []} for exercise in strength],
+    "4. Cooldown portion": [{"exercise": exercise, "alternatives": []} for exercise in cooldown]
+  }
+
+def test_replace_sets_changes_the_parsed_sets_not_a_note():
+  text = "Cable rows - 4 x 12 reps (last 2 sets to failure)"
+
+  assert replace_sets(text, 3) == "Cable rows - 3 x 12 reps (last 2 sets to failure)"
+  assert parse_exercise(replace_sets(text, 3), "strength")["sets"] == 3
+
+def test_replace_sets_keeps_set_wording():
+  assert replace_sets("Goblet squat - 3 sets of 10 reps", 1) == "Goblet squat - 1 set of 10 reps"
+  assert replace_sets("Leg swings - 1 set of 15", 2) == "Leg swings - 2 sets of 15"
+
+def test_cardio_in_hours_is_not_adjustable():
+  cardio, _ = get_adjustable_exercises(make_workout([], ["Walk - 1 hour"]))
+
+  assert cardio == []
+
+def test_unreachable_goal_with_note_in_sets_stops():
+  workout = make_workout(["Cable rows - 4 x 12 reps (last 2 sets to failure)"], [])
+  fitted, check = fit_workout_length(workout, "2 minutes")
+
+  assert fitted is workout
+  assert check["status"] == "over"
+
+def test_unreachable_goal_with_cardio_in_hours_stops():
+  workout = make_workout([], ["Walk - 1 hour"])
+  fitted, check = fit_workout_length(workout, "30 minutes")
+
+  assert fitted is workout
+  assert check["status"] == "over"
+
+def test_reachable_goal_is_fixed():
+  workout = make_workout(["Goblet squat - 4 sets of 10 reps", "Row - 4 sets of 10 reps"], ["Walk - 10 minutes"])
+  fitted, check = fit_workout_length(workout, "25 minutes")
+
+  assert check["status"] == "ok"
+  assert check["adjusted"]
+  assert fitted["4. Cooldown portion"][0]["exercise"] != "Walk - 10 minutes"
@@ -9,6 +9,8 @@ import os
 load_dotenv()
 
 from runnable import get_runnable
+from streaming import add_delta_stream_route
+from profiling import add_profiling_middleware
 
 # Sets up LangSmith tracing
 os.environ['LANGCHAIN_TRACING_V2'] = 'true'
@@ -31,6 +33,9 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Profiles requests with the X-Profile-Request header (or 1 in N requests) when PROFILING_ENABLED is yes
+add_profiling_middleware(app)
+
 def main():
     # Fetch the Trainer's Ally runnable which generates the workouts
     runnable = get_runnable()
@@ -42,6 +47,9 @@ def main():
         path="/workout",
     )
 
+    # Create the route that streams only the state deltas and tokens to the frontend
+    add_delta_stream_route(app, runnable, path="/workout")
+
     # Start the API
     uvicorn.run(app, host="localhost", port=8000)
 
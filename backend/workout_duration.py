@@ -0,0 +1,336 @@
+import re
+
+MICROSECONDS_PER_SECOND = 1_000_000
+
+# How far off the goal workout length a workout can be (when the goal is a single number) before it gets flagged
+LENGTH_TOLERANCE = 0.1
+
+# Rough time it takes to do a single rep, and the time to get set up for the next exercise
+SECONDS_PER_REP = 3
+SECONDS_BETWEEN_EXERCISES = 30
+
+# The default rest between sets for each section of the workout
+REST_BETWEEN_SETS = {
+  "warm up": 15,
+  "balance": 30,
+  "strength": 60,
+  "cooldown": 0
+}
+
+# How far the sets and cardio can be changed locally while still following the prompts
+MIN_STRENGTH_SETS = 2
+MAX_STRENGTH_SETS = 4
+MIN_COOLDOWN_CARDIO_MINUTES = 5
+MAX_COOLDOWN_CARDIO_MINUTES = 10
+
+# Upper bound on the number of local changes so a workout that can't be fixed never loops forever
+MAX_ADJUSTMENTS = 50
+
+UNIT_SECONDS = r"(hours?|hrs?|minutes?|mins?|seconds?|secs?)"
+SETS_PATTERN = re.compile(r"(\d+)\s*(?:sets?\s*(?:of|x|×)?|x|×)\s*(\d+)(?:\s*-\s*\d+)?\s*(reps?|" + UNIT_SECONDS[1:-1] + r")?", re.IGNORECASE)
+SETS_WORD_PATTERN = re.compile(r"^(\d+\s*)sets?\b", re.IGNORECASE)
+TIME_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(?:\s*-\s*(\d+(?:\.\d+)?))?\s*" + UNIT_SECONDS + r"\b", re.IGNORECASE)
+REPS_PATTERN = re.compile(r"(\d+)(?:\s*-\s*(\d+))?\s*reps?\b", re.IGNORECASE)
+PER_SIDE_PATTERN = re.compile(r"\b(each|per)\s+(side|leg|arm)\b", re.IGNORECASE)
+
+def unit_to_seconds(unit):
+  """
+  Converts a unit of time written in a workout into seconds
+  Args:
+      unit (str): the unit (i.e. minutes, secs, hr)
+  Returns:
+      int: the number of seconds in the unit
+  """
+  unit = unit.lower()
+
+  if unit.startswith("h"):
+    return 3600
+  if unit.startswith("m"):
+    return 60
+
+  return 1
+
+def get_section_type(section_name):
+  """
+  Maps the name of a section in the workout JSON to the type of section
+  Args:
+      section_name (str): the name of the section (i.e. 1. Warm up)
+  Returns:
+      str: the type of section (warm up, balance, strength, or cooldown)
+  """
+  name = section_name.lower()
+
+  if "warm" in name:
+    return "warm up"
+  if "balance" in name or "core" in name:
+    return "balance"
+  if "cool" in name:
+    return "cooldown"
+
+  return "strength"
+
+def parse_workout_length(workout_length):
+  """
+  Parses the goal workout length given by the trainer into a range of microseconds
+  Args:
+      workout_length (str): the goal workout length (i.e. 45 minutes, 1 hour, 45-60 min)
+  Returns:
+      tuple: the lowest and highest acceptable length in microseconds, or None if it can't be parsed
+  """
+  matches = list(TIME_PATTERN.finditer(workout_length or ""))
+
+  if not matches:
+    return None
+
+  # A range like 45-60 minutes gives the bounds directly
+  if len(matches) == 1 and matches[0].group(2):
+    seconds = unit_to_seconds(matches[0].group(3))
+    low = float(matches[0].group(1)) * seconds
+    high = float(matches[0].group(2)) * seconds
+  else:
+    # Otherwise add up the parts (i.e. 1 hour 30 minutes) and allow some tolerance either way
+    total = sum(float(m.group(1)) * unit_to_seconds(m.group(3)) for m in matches)
+    low = total * (1 - LENGTH_TOLERANCE)
+    high = total * (1 + LENGTH_TOLERANCE)
+
+  return (int(low * MICROSECONDS_PER_SECOND), int(high * MICROSECONDS_PER_SECOND))
+
+def parse_exercise(exercise, section_type):
+  """
+  Parses the sets, reps, and time out of an exercise string to estimate how long it takes
+  Args:
+      exercise (str): the exercise with its reps/time (i.e. Goblet squats - 3 sets of 10 reps)
+      section_type (str): the type of section the exercise is in
+  Returns:
+      dict: the sets, seconds of work per set, whether it is cardio, and the estimated duration in microseconds
+  """
+  sets = 1
+  work_seconds = None
+  is_cardio = False
+  sets_match = SETS_PATTERN.search(exercise)
+
+  if sets_match:
+    sets = int(sets_match.group(1))
+    unit = sets_match.group(3)
+
+    if unit and not unit.lower().startswith("rep"):
+      work_seconds = int(sets_match.group(2)) * unit_to_seconds(unit)
+    else:
+      work_seconds = int(sets_match.group(2)) * SECONDS_PER_REP
+  else:
+    time_match = TIME_PATTERN.search(exercise)
+    reps_match = REPS_PATTERN.search(exercise)
+
+    if time_match:
+      # Use the middle of ranges like 5-10 minutes
+      low = float(time_match.group(1))
+      high = float(time_match.group(2) or low)
+      work_seconds = (low + high) / 2 * unit_to_seconds(time_match.group(3))
+      is_cardio = unit_to_seconds(time_match.group(3)) >= 60
+    elif reps_match:
+      work_seconds = int(reps_match.group(1)) * SECONDS_PER_REP
+
+  # Anything without reps/time is treated as a minute of work
+  if work_seconds is None:
+    work_seconds = 60
+
+  if PER_SIDE_PATTERN.search(exercise):
+    work_seconds *= 2
+
+  seconds = sets * work_seconds + (sets - 1) * REST_BETWEEN_SETS[section_type] + SECONDS_BETWEEN_EXERCISES
+
+  return {
+    "sets": sets,
+    "work_seconds": work_seconds,
+    "is_cardio": is_cardio,
+    "duration": int(seconds * MICROSECONDS_PER_SECOND)
+  }
+
+def estimate_workout_duration(workout):
+  """
+  Estimates how long a workout takes from the reps/time of every exercise
+  Args:
+      workout (dict): the workout JSON object created by the LLM
+  Returns:
+      int: the estimated length of the workout in microseconds
+  """
+  total = 0
+
+  for section_name, exercises in workout.items():
+    if not isinstance(exercises, list):
+      continue
+
+    section_type = get_section_type(section_name)
+    for exercise in exercises:
+      if isinstance(exercise, dict) and "exercise" in exercise:
+        total += parse_exercise(exercise["exercise"], section_type)["duration"]
+
+  return total
+
+def replace_sets(text, sets):
+  """
+  Changes the number of sets written in an exercise string
+  Args:
+      text (str): the exercise string
+      sets (int): the new number of sets
+  Returns:
+      str: the exercise string with the new number of sets
+  """
+  # Change the same sets that parse_exercise reads, not something like "last 2 sets to failure" in a note
+  match = SETS_PATTERN.search(text)
+  if not match:
+    return text
+
+  sets_text = str(sets) + text[match.end(1):match.end()]
+  sets_text = SETS_WORD_PATTERN.sub(lambda m: f"{m.group(1)}set{'' if sets == 1 else 's'}", sets_text, count=1)
+
+  return text[:match.start()] + sets_text + text[match.end():]
+
+def replace_minutes(text, minutes):
+  """
+  Changes the number of minutes written in a (cardio) exercise string
+  Args:
+      text (str): the exercise string
+      minutes (int): the new number of minutes
+  Returns:
+      str: the exercise string with the new number of minutes
+  """
+  match = TIME_PATTERN.search(text)
+
+  # Leaves things like stretches held for seconds alone
+  if not match or unit_to_seconds(match.group(3)) != 60:
+    return text
+
+  return text[:match.start()] + f"{minutes} minutes" + text[match.end():]
+
+def get_adjustable_exercises(workout):
+  """
+  Finds the exercises that can be changed locally to fix the length of a workout
+  Args:
+      workout (dict): the workout JSON object
+  Returns:
+      tuple: the cooldown cardio exercises and the strength exercises with sets
+  """
+  cardio = []
+  strength = []
+
+  for section_name, exercises in workout.items():
+    if not isinstance(exercises, list):
+      continue
+
+    section_type = get_section_type(section_name)
+    for exercise in exercises:
+      if not isinstance(exercise, dict) or "exercise" not in exercise:
+        continue
+
+      parsed = parse_exercise(exercise["exercise"], section_type)
+      time_match = TIME_PATTERN.search(exercise["exercise"])
+
+      # Only cardio written in minutes can be changed a minute at a time (not something like 1 hour)
+      if section_type == "cooldown" and parsed["is_cardio"] and unit_to_seconds(time_match.group(3)) == 60:
+        cardio.append(exercise)
+      elif section_type == "strength" and SETS_PATTERN.search(exercise["exercise"]):
+        strength.append(exercise)
+
+  return cardio, strength
+
+def check_workout_length(workout, workout_length):
+  """
+  Checks the estimated length of a workout against the goal length without changing the workout
+  Args:
+      workout (dict): the workout JSON object
+      workout_length (str): the goal workout length
+  Returns:
+      dict: the duration check to store in the state
+  """
+  target = parse_workout_length(workout_length)
+  estimated = estimate_workout_duration(workout)
+
+  if target is None:
+    return {"status": "unknown", "estimated_duration": estimated, "original_duration": estimated, "adjusted": False}
+
+  low, high = target
+  if estimated > high:
+    status = "over"
+  elif estimated < low:
+    status = "under"
+  else:
+    status = "ok"
+
+  return {
+    "status": status,
+    "estimated_duration": estimated,
+    "original_duration": estimated,
+    "target_duration": [low, high],
+    "adjusted": False
+  }
+
+def fit_workout_length(workout, workout_length):
+  """
+  Checks the estimated length of a workout against the goal length, and fixes it locally when it
+  can by changing the cooldown cardio minutes and the strength sets (no LLM call needed).
+  If the goal length can't be reached this way, the workout is left as is and just flagged
+  Args:
+      workout (dict): the workout JSON object created by the LLM
+      workout_length (str): the goal workout length
+  Returns:
+      tuple: the (possibly fixed) workout, and the duration check to store in the state
+  """
+  check = check_workout_length(workout, workout_length)
+
+  if check["status"] in ["ok", "unknown"]:
+    return workout, check
+
+  low, high = check["target_duration"]
+  fitted = {section: [dict(exercise) if isinstance(exercise, dict) else exercise for exercise in exercises] if isinstance(exercises, list) else exercises for section, exercises in workout.items()}
+  cardio, strength = get_adjustable_exercises(fitted)
+  duration = check["estimated_duration"]
+  too_long = check["status"] == "over"
+
+  # Each step changes one thing by the smallest amount, cardio first since it's the least disruptive
+  def next_change():
+    for exercise in cardio:
+      minutes = round(parse_exercise(exercise["exercise"], "cooldown")["work_seconds"] / 60)
+      if too_long and minutes > MIN_COOLDOWN_CARDIO_MINUTES:
+        return exercise, lambda text: replace_minutes(text, max(minutes - 1, MIN_COOLDOWN_CARDIO_MINUTES))
+      if not too_long and minutes < MAX_COOLDOWN_CARDIO_MINUTES:
+        return exercise, lambda text: replace_minutes(text, min(minutes + 1, MAX_COOLDOWN_CARDIO_MINUTES))
+
+    # Take sets from the exercises with the most sets first (and add to the ones with the fewest)
+    for exercise in sorted(strength, key=lambda e: parse_exercise(e["exercise"], "strength")["sets"], reverse=too_long):
+      sets = parse_exercise(exercise["exercise"], "strength")["sets"]
+      if too_long and sets > MIN_STRENGTH_SETS:
+        return exercise, lambda text: replace_sets(text, sets - 1)
+      if not too_long and sets < MAX_STRENGTH_SETS:
+        return exercise, lambda text: replace_sets(text, sets + 1)
+
+    return None, None
+
+  # Only moves in one direction so a narrow goal range can't make it flip back and forth
+  for _ in range(MAX_ADJUSTMENTS):
+    if not ((duration > high) if too_long else (duration < low)):
+      break
+
+    exercise, change = next_change()
+    if exercise is None:
+      break
+
+    # Stop if the change couldn't be written into the exercise or didn't change the length
+    changed = change(exercise["exercise"])
+    if changed == exercise["exercise"]:
+      break
+
+    # Keep the alternatives in line with the exercise so picking one doesn't undo the fix
+    exercise["exercise"] = changed
+    exercise["alternatives"] = [change(alternative) for alternative in exercise.get("alternatives", [])]
+
+    new_duration = estimate_workout_duration(fitted)
+    if new_duration == duration:
+      break
+    duration = new_duration
+
+  # A partial fix would hide how far off the workout is, so only keep the changes if they reached the goal
+  if duration > high or duration < low:
+    return workout, check
+
+  return fitted, {**check, "status": "ok", "estimated_duration": duration, "adjusted": True}
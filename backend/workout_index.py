@@ -0,0 +1,228 @@
+from collections import Counter, defaultdict
+import threading
+import argparse
+import random
+import heapq
+import math
+import json
+import time
+import re
+import os
+
+import recording
+
+# Where the approved workouts get saved so the index can be rebuilt when the backend restarts
+approved_workouts_path = os.environ.get("APPROVED_WORKOUTS_PATH") or "approved_workouts.jsonl"
+
+# How many similar approved workouts to include in the generator prompt
+NUM_EXAMPLES = 2
+
+# Standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+  """
+  Splits text into lowercase word tokens for the index
+  Args:
+      text (str): the text to tokenize
+  Returns:
+      List[str]: the tokens
+  """
+  return TOKEN_PATTERN.findall(text.lower())
+
+def get_document_text(client_info, extra_criteria):
+  """
+  Combines the fields an approved workout is searched by into a single piece of text
+  (the phase isn't included since results are filtered to the same phase instead)
+  Args:
+      client_info (str): information about the client
+      extra_criteria (str): the extra criteria for the workouts
+  Returns:
+      str: the text to index or query with
+  """
+  return f"{client_info}\n{extra_criteria}"
+
+def compact_workout(workout):
+  """
+  Strips the alternatives out of a workout so it is short enough to use as an example in a prompt
+  Args:
+      workout (dict): the workout JSON object
+  Returns:
+      dict: each section of the workout with just the exercises
+  """
+  return {
+    section: [exercise["exercise"] for exercise in exercises if isinstance(exercise, dict) and "exercise" in exercise]
+    for section, exercises in workout.items() if isinstance(exercises, list)
+  }
+
+class WorkoutIndex:
+  """
+  In-process BM25 index over the weeks of workouts trainers approved (the final workouts from result_generator)
+  that can be updated one week at a time without rebuilding. Each week is one document so the examples
+  for a query come from different clients
+  """
+  def __init__(self):
+    self.documents = []
+    self.document_phases = []
+    self.document_lengths = []
+    # Maps each term to the (document, term frequency) pairs it appears in so a query only scores matching documents
+    self.postings = defaultdict(list)
+    self.total_length = 0
+    self.lock = threading.Lock()
+
+  def add(self, client_info, extra_criteria, phase, workouts):
+    tokens = tokenize(get_document_text(client_info, extra_criteria))
+
+    with self.lock:
+      document_id = len(self.documents)
+      self.documents.append([compact_workout(workout) for workout in workouts])
+      self.document_phases.append(str(phase))
+      self.document_lengths.append(len(tokens))
+      self.total_length += len(tokens)
+
+      for term, frequency in Counter(tokens).items():
+        self.postings[term].append((document_id, frequency))
+
+  def query(self, client_info, extra_criteria, phase, day, k=NUM_EXAMPLES):
+    query_terms = set(tokenize(get_document_text(client_info, extra_criteria)))
+    phase = str(phase)
+
+    with self.lock:
+      num_documents = len(self.documents)
+      if num_documents == 0:
+        return []
+
+      average_length = self.total_length / num_documents
+      scores = defaultdict(float)
+
+      for term in query_terms:
+        postings = self.postings.get(term)
+        if not postings:
+          continue
+
+        idf = math.log(1 + (num_documents - len(postings) + 0.5) / (len(postings) + 0.5))
+        for document_id, frequency in postings:
+          # Workouts from other phases have a different focus, so they are never used as examples
+          if self.document_phases[document_id] != phase:
+            continue
+
+          length_norm = 1 - BM25_B + BM25_B * self.document_lengths[document_id] / average_length
+          scores[document_id] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+
+      top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+      # Use the same day of each similar week (or its last day if the week was shorter)
+      return [self.documents[document_id][min(day, len(self.documents[document_id])) - 1] for document_id, _ in top if self.documents[document_id]]
+
+def load_index(path=None):
+  """
+  Builds the index from the approved workouts saved to disk
+  Args:
+      path (str): the path of the approved workouts file (defaults to APPROVED_WORKOUTS_PATH)
+  Returns:
+      WorkoutIndex: the index of every approved workout
+  """
+  path = path or approved_workouts_path
+  index = WorkoutIndex()
+
+  if os.path.exists(path):
+    with open(path) as f:
+      for line_number, line in enumerate(f, start=1):
+        if not line.strip():
+          continue
+
+        # A line cut off by a crash mid-write shouldn't stop the backend from starting
+        try:
+          week = json.loads(line)
+          index.add(week["client_info"], week["extra_criteria"], week["phase"], week["created_workouts"])
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+          print(f"---SKIPPING MALFORMED APPROVED WORKOUT ON LINE {line_number} OF {path}: {e}---")
+
+  return index
+
+workout_index = load_index()
+
+def add_approved_week(state):
+  """
+  Adds a finished week of workouts to the index and saves it so the index survives restarts
+  Args:
+      state (dict): the graph state once result_generator has run
+  """
+  # Replayed sessions were already approved the first time around
+  if recording.active_replay is not None:
+    return
+
+  week = {key: state[key] for key in ["client_info", "extra_criteria", "phase", "created_workouts"]}
+
+  workout_index.add(week["client_info"], week["extra_criteria"], week["phase"], week["created_workouts"])
+
+  with workout_index.lock:
+    with open(approved_workouts_path, "a") as f:
+      f.write(json.dumps(week) + "\n")
+
+def get_approved_examples(client_info, extra_criteria, phase, day):
+  """
+  Finds the approved workouts most similar to the current client and formats them for the generator prompt
+  Args:
+      client_info (str): information about the client
+      extra_criteria (str): the extra criteria for the workouts
+      phase (int): the phase of the workouts
+      day (int): the day of the week the workout is being created for
+  Returns:
+      str: the compact example workouts, or a note that there are none yet
+  """
+  examples = workout_index.query(client_info, extra_criteria, phase, day)
+
+  if not examples:
+    return "No approved workouts for this phase yet."
+
+  return "".join([f"Approved workout {i + 1}:\n{json.dumps(w, separators=(',', ':'))}\n\n" for i,w in enumerate(examples)])
+
+def benchmark(num_weeks, num_queries):
+  """
+  Times building the index, adding a week to it, and querying it with synthetic workouts
+  Args:
+      num_weeks (int): the number of approved weeks to build the index with
+      num_queries (int): the number of queries to time
+  """
+  words = ["strength", "weight", "loss", "knee", "injury", "dumbbells", "barbell", "kettlebell", "bands", "running",
+           "mobility", "yoga", "hiit", "cardio", "beginner", "advanced", "male", "female", "back", "pain", "muscle", "toning"]
+  workout = {
+    "1. Warm up": [{"exercise": "Treadmill jog - 10 minutes", "alternatives": ["Bike - 10 minutes"]}],
+    "3. Strength portion": [{"exercise": "Goblet squat - 3 sets of 10 reps", "alternatives": ["Split squat - 3 sets of 10 reps"]}]
+  }
+
+  def random_text():
+    return " ".join(random.choices(words, k=12))
+
+  weeks = [(random_text(), random_text(), random.randint(1, 3)) for _ in range(num_weeks)]
+
+  start = time.perf_counter()
+  index = WorkoutIndex()
+  for client_info, extra_criteria, phase in weeks:
+    index.add(client_info, extra_criteria, phase, [workout] * 5)
+  build = time.perf_counter() - start
+
+  start = time.perf_counter()
+  index.add(random_text(), random_text(), 1, [workout] * 5)
+  update = time.perf_counter() - start
+
+  start = time.perf_counter()
+  for _ in range(num_queries):
+    index.query(random_text(), random_text(), random.randint(1, 3), random.randint(1, 5))
+  query = (time.perf_counter() - start) / num_queries
+
+  print(f"Built index of {len(index.documents)} weeks in {build * 1000:.2f}ms")
+  print(f"Added a week (5 workouts) in {update * 1000:.3f}ms")
+  print(f"Average query latency over {num_queries} queries: {query * 1000:.3f}ms")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Benchmark the approved workout index")
+  parser.add_argument("--weeks", type=int, default=5000, help="number of approved weeks to index")
+  parser.add_argument("--queries", type=int, default=200, help="number of queries to time")
+  args = parser.parse_args()
+
+  benchmark(args.weeks, args.queries)